@@ -56,6 +56,22 @@ class MtxtFile:
         """
         ...
 
+    @staticmethod
+    def parse_bytes(data: bytes) -> MtxtFile:
+        """
+        Parse an MTXT file from UTF-8 encoded bytes.
+
+        Args:
+            data: The MTXT content as UTF-8 bytes
+
+        Returns:
+            The parsed MTXT file
+
+        Raises:
+            ParseError: If the bytes are not valid UTF-8 or cannot be parsed
+        """
+        ...
+
     @staticmethod
     def from_file(path: str) -> MtxtFile:
         """
@@ -145,6 +161,20 @@ class MtxtFile:
         """
         ...
 
+    def serialize_and_reparse(self) -> MtxtFile:
+        """
+        Serialize this file and parse the result, without going through str.
+
+        Equivalent to ``mtxt.parse(str(file))``, but the text stays in Rust.
+
+        Returns:
+            A new MtxtFile parsed from the serialized content
+
+        Raises:
+            ParseError: If the serialized content cannot be parsed
+        """
+        ...
+
     def save(self, path: str) -> None:
         """
         Save this MTXT file to disk.
@@ -177,6 +207,17 @@ class MtxtFile:
         """
         ...
 
+    def metadata_len(self) -> int:
+        """
+        Get the number of global metadata entries.
+
+        Cheaper than len(file.metadata), which copies every key and value.
+
+        Returns:
+            The number of global metadata entries
+        """
+        ...
+
     def get_meta(self, key: str) -> Optional[str]:
         """
         Get a specific global metadata value.
@@ -242,6 +283,23 @@ def parse(content: str) -> MtxtFile:
     """
     ...
 
+def parse_bytes(data: bytes) -> MtxtFile:
+    """
+    Parse UTF-8 encoded MTXT bytes into an MtxtFile object.
+
+    Avoids decoding to str first, e.g. for ``Path.read_bytes()`` output.
+
+    Args:
+        data: The MTXT content as UTF-8 bytes
+
+    Returns:
+        The parsed MTXT file
+
+    Raises:
+        ParseError: If the bytes are not valid UTF-8 or cannot be parsed
+    """
+    ...
+
 def load(path: str) -> MtxtFile:
     """
     Load an MTXT file from disk.
@@ -39,6 +39,13 @@ impl PyMtxtFile {
         }
     }
 
+    #[staticmethod]
+    fn parse_bytes(data: &[u8]) -> PyResult<Self> {
+        let content = std::str::from_utf8(data)
+            .map_err(|e| ParseError::new_err(format!("Failed to parse MTXT: invalid UTF-8: {}", e)))?;
+        Self::parse(content)
+    }
+
     #[staticmethod]
     fn from_file(path: &str) -> PyResult<Self> {
         let content = std::fs::read_to_string(path)
@@ -93,6 +100,10 @@ impl PyMtxtFile {
         }
     }
 
+    fn serialize_and_reparse(&self) -> PyResult<Self> {
+        Self::parse(&self.inner.to_string())
+    }
+
     fn save(&self, path: &str) -> PyResult<()> {
         let content = self.inner.to_string();
         std::fs::write(path, content)
@@ -113,6 +124,10 @@ impl PyMtxtFile {
             .collect())
     }
 
+    fn metadata_len(&self) -> usize {
+        self.inner.get_global_meta().len()
+    }
+
     fn get_meta(&self, key: &str) -> Option<String> {
         self.inner.get_global_meta_value(key).map(|v| v.to_string())
     }
@@ -152,6 +167,14 @@ fn parse(content: &str) -> PyResult<PyMtxtFile> {
     PyMtxtFile::parse(content)
 }
 
+/// Parse MTXT content from UTF-8 bytes
+///
+/// Raises ParseError if the bytes are not valid UTF-8 or not valid MTXT.
+#[pyfunction]
+fn parse_bytes(data: &[u8]) -> PyResult<PyMtxtFile> {
+    PyMtxtFile::parse_bytes(data)
+}
+
 /// Load MTXT from file
 ///
 /// Raises IOError or ParseError.
@@ -207,6 +230,7 @@ fn mtxt_to_midi(mtxt_path: &str, midi_path: &str, verbose: bool) -> PyResult<()>
 fn mtxt(m: &Bound<'_, PyModule>) -> PyResult<()> {
     m.add_class::<PyMtxtFile>()?;
     m.add_function(wrap_pyfunction!(parse, m)?)?;
+    m.add_function(wrap_pyfunction!(parse_bytes, m)?)?;
     m.add_function(wrap_pyfunction!(load, m)?)?;
 
     #[cfg(feature = "midi")]
@@ -5,6 +5,7 @@ This file is automatically loaded by pytest and provides shared fixtures
 and configuration for all test modules.
 """
 
+import os
 import pytest
 import sys
 
@@ -17,6 +18,28 @@ def pytest_configure(config):
     config.addinivalue_line(
         "markers", "midi: marks tests that require MIDI support"
     )
+    config.addinivalue_line(
+        "markers",
+        "heavy: marks MIDI roundtrip tests skipped under coverage unless MTXT_FULL_TESTS=1"
+    )
+
+
+def running_under_coverage(config):
+    """Check if tests are being measured by coverage.py or pytest-cov"""
+    if os.environ.get("COVERAGE_RUN"):
+        return True
+    return config.pluginmanager.hasplugin("_cov") and bool(config.getoption("cov_source", None))
+
+
+def pytest_collection_modifyitems(config, items):
+    """Skip `heavy` tests under coverage, unless MTXT_FULL_TESTS=1 is set"""
+    if os.environ.get("MTXT_FULL_TESTS") == "1" or not running_under_coverage(config):
+        return
+
+    skip_heavy = pytest.mark.skip(reason="heavy MIDI test skipped under coverage (set MTXT_FULL_TESTS=1)")
+    for item in items:
+        if "heavy" in item.keywords:
+            item.add_marker(skip_heavy)
 
 
 @pytest.fixture(scope="session")
@@ -43,7 +66,7 @@ def has_midi(mtxt_module):
     return hasattr(mtxt_module, 'midi_to_mtxt')
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_mtxt_content():
     """Provides sample MTXT content for testing"""
     return """mtxt 1.0
@@ -57,15 +80,59 @@ meta global artist "Test Artist"
 """
 
 
+@pytest.fixture(autouse=True)
+def skip_without_midi(request):
+    """Skip tests marked with `midi` when MIDI support is not built"""
+    if request.node.get_closest_marker("midi") is None:
+        return
+    if not request.getfixturevalue("has_midi"):
+        pytest.skip("MIDI support not available (midi feature not enabled)")
+
+
+@pytest.fixture(scope="session")
+def parsed_sample(mtxt_module, sample_mtxt_content):
+    """
+    Provides the sample MTXT content parsed once per session.
+
+    Shared across tests - do not mutate. Use `fresh_parsed` instead.
+    """
+    return mtxt_module.parse(sample_mtxt_content)
+
+
 @pytest.fixture
+def fresh_parsed(mtxt_module, parsed_sample):
+    """Provides a private, mutable copy of the parsed sample"""
+    return mtxt_module.parse(str(parsed_sample))
+
+
+@pytest.fixture(scope="session")
+def sample_midi_path(tmp_path_factory, has_midi, parsed_sample):
+    """
+    Provides the sample MTXT content converted to MIDI once per session.
+
+    Under pytest-xdist each worker has its own session and base temp
+    directory, so every worker writes its own copy and nothing collides.
+    Shared across tests - do not modify the file.
+    """
+    if not has_midi:
+        pytest.skip("MIDI support not available")
+
+    path = tmp_path_factory.mktemp("midi") / "base.mid"
+    parsed_sample.to_midi(str(path))
+    return path
+
+
+@pytest.fixture(scope="session")
 def test_file_paths():
     """Provides paths to test data files"""
     from pathlib import Path
 
     tests_dir = Path(__file__).parent.parent
     snapshots = tests_dir / "snapshots"
+    data = Path(__file__).parent / "data"
 
     return {
         "basic": snapshots / "basic.in.mtxt",
         "transitions": snapshots / "transitions.in.mtxt",
+        "large": data / "large_1000.mtxt",
     }
@@ -1,35 +1,29 @@
-#!/usr/bin/env python3
 """
-Test script for the mtxt Python bindings.
+Tests for the mtxt Python bindings.
 
-Run this after building with: maturin develop
+Run with pytest after building with: maturin develop
+    pytest tests/python/
 """
 
-import sys
+import os
 
+import pytest
 
-def test_basic_parsing():
-    """Test basic MTXT parsing"""
-    print("Test 1: Basic parsing...")
-    import mtxt
 
-    content = """mtxt 1.0
-meta global title "Test Song"
-meta global composer "Test Composer"
+MINIMAL_MTXT = """mtxt 1.0
 0 tempo 120
-0 timesig 4/4
-0 note C4 dur=1 vel=0.8
-1 note D4 dur=1 vel=0.8
-2 note E4 dur=1 vel=0.8
-3 note F4 dur=1 vel=0.8
+0 note C4 dur=1
 """
 
-    file = mtxt.parse(content)
+
+def test_basic_parsing(parsed_sample):
+    """Test basic MTXT parsing"""
+    file = parsed_sample
 
     assert file.version == "1.0", f"Expected version '1.0', got '{file.version}'"
     assert len(file) > 0, "File should have records"
     assert file.duration is not None, "File should have duration"
-    assert file.duration == 3.0, f"Expected duration 3.0, got {file.duration}"
+    assert file.duration == 2.0, f"Expected duration 2.0, got {file.duration}"
 
     # Check metadata
     metadata_dict = dict(file.metadata)
@@ -40,79 +34,44 @@ meta global composer "Test Composer"
     title = file.get_meta("title")
     assert title == '"Test Song"', f"get_meta failed: {title}"
 
-    print("  ✓ Parsing works")
-    print(f"  ✓ Version: {file.version}")
-    print(f"  ✓ Duration: {file.duration} beats")
-    print(f"  ✓ Records: {len(file)}")
-    print(f"  ✓ Metadata: {dict(file.metadata)}")
-
 
-def test_file_io():
+def test_file_io(mtxt_module, tmp_path):
     """Test file I/O operations"""
-    print("\nTest 2: File I/O...")
-    import mtxt
-    import tempfile
-    import os
-
-    content = """mtxt 1.0
-0 tempo 120
-0 note C4 dur=1
-"""
+    mtxt = mtxt_module
 
     # Parse and save
-    file = mtxt.parse(content)
+    file = mtxt.parse(MINIMAL_MTXT)
 
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.mtxt', delete=False) as f:
-        temp_path = f.name
+    temp_path = str(tmp_path / "file.mtxt")
+    file.save(temp_path)
 
-    try:
-        file.save(temp_path)
-        print(f"  ✓ Saved to {temp_path}")
+    # Load back
+    file2 = mtxt.load(temp_path)
+    assert file2.version == "1.0", "Loaded file should have same version"
 
-        # Load back
-        file2 = mtxt.load(temp_path)
-        assert file2.version == "1.0", "Loaded file should have same version"
-        print(f"  ✓ Loaded from file")
+    # Also test from_file
+    file3 = mtxt.MtxtFile.from_file(temp_path)
+    assert file3.version == "1.0", "from_file should work"
 
-        # Also test from_file
-        file3 = mtxt.MtxtFile.from_file(temp_path)
-        assert file3.version == "1.0", "from_file should work"
-        print(f"  ✓ MtxtFile.from_file works")
 
-    finally:
-        if os.path.exists(temp_path):
-            os.unlink(temp_path)
-
-
-def test_string_representation():
+def test_string_representation(parsed_sample):
     """Test string representations"""
-    print("\nTest 3: String representations...")
-    import mtxt
-
-    content = """mtxt 1.0
-0 tempo 120
-0 note C4 dur=1
-"""
-
-    file = mtxt.parse(content)
+    file = parsed_sample
 
     # Test __str__
     str_repr = str(file)
     assert "mtxt 1.0" in str_repr, "__str__ should contain version"
     assert "tempo 120" in str_repr, "__str__ should contain tempo"
-    print(f"  ✓ __str__ works")
 
     # Test __repr__
     repr_str = repr(file)
     assert "MtxtFile" in repr_str, "__repr__ should contain class name"
     assert "1.0" in repr_str, "__repr__ should contain version"
-    print(f"  ✓ __repr__ works: {repr_str}")
 
 
-def test_metadata_manipulation():
+def test_metadata_manipulation(mtxt_module):
     """Test metadata manipulation"""
-    print("\nTest 4: Metadata manipulation...")
-    import mtxt
+    mtxt = mtxt_module
 
     file = mtxt.MtxtFile()
 
@@ -127,43 +86,27 @@ def test_metadata_manipulation():
     assert title == '"My Song"', f"set_metadata failed for title: {title}"
     assert artist == '"My Artist"', f"set_metadata failed for artist: {artist}"
 
-    print(f"  ✓ Metadata manipulation works")
-    print(f"  ✓ Title: {title}")
-    print(f"  ✓ Artist: {artist}")
-
 
-def test_error_handling():
+def test_error_handling(mtxt_module):
     """Test error handling"""
-    print("\nTest 5: Error handling...")
-    import mtxt
+    mtxt = mtxt_module
 
     # Test parse error
-    try:
+    with pytest.raises(mtxt.ParseError, match="Failed to parse MTXT"):
         mtxt.parse("invalid content")
-        assert False, "Should have raised ParseError"
-    except mtxt.ParseError as e:
-        print(f"  ✓ ParseError raised correctly: {e}")
+    with pytest.raises(mtxt.ParseError, match="invalid UTF-8"):
+        mtxt.parse_bytes(b"mtxt 1.0\n\xff")
 
     # Test file not found
-    try:
+    with pytest.raises(IOError, match="nonexistent"):
         mtxt.load("/nonexistent/file.mtxt")
-        assert False, "Should have raised IOError"
-    except IOError as e:
-        print(f"  ✓ IOError raised correctly for missing file")
 
 
-def test_midi_conversion():
+@pytest.mark.midi
+@pytest.mark.heavy
+def test_midi_conversion(mtxt_module, tmp_path):
     """Test MIDI conversion (if available)"""
-    print("\nTest 6: MIDI conversion...")
-    import mtxt
-
-    # Check if MIDI feature is available
-    if not hasattr(mtxt, 'midi_to_mtxt'):
-        print("  ⊘ MIDI conversion not available (midi feature not enabled)")
-        return
-
-    import tempfile
-    import os
+    mtxt = mtxt_module
 
     content = """mtxt 1.0
 meta global title "Test MIDI Conversion"
@@ -175,107 +118,31 @@ meta global title "Test MIDI Conversion"
 
     file = mtxt.parse(content)
 
-    with tempfile.NamedTemporaryFile(suffix='.mid', delete=False) as f:
-        midi_path = f.name
-
-    try:
-        # Convert to MIDI
-        file.to_midi(midi_path, verbose=False)
-        assert os.path.exists(midi_path), "MIDI file should exist"
-        print(f"  ✓ Converted to MIDI: {midi_path}")
-
-        # Convert back to MTXT
-        file2 = mtxt.MtxtFile.from_midi(midi_path, verbose=False)
-        assert file2.version is not None, "Converted file should have version"
-        print(f"  ✓ Converted from MIDI back to MTXT")
-
-        # Test the convenience functions
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.mtxt', delete=False) as f2:
-            mtxt_path = f2.name
-
-        try:
-            file.save(mtxt_path)
+    midi_path = str(tmp_path / "file.mid")
 
-            with tempfile.NamedTemporaryFile(suffix='.mid', delete=False) as f3:
-                midi_path2 = f3.name
+    # Convert to MIDI
+    file.to_midi(midi_path, verbose=False)
+    assert os.path.exists(midi_path), "MIDI file should exist"
 
-            try:
-                # Test mtxt_to_midi convenience function
-                mtxt.mtxt_to_midi(mtxt_path, midi_path2, verbose=False)
-                assert os.path.exists(midi_path2), "MIDI file should exist"
-                print(f"  ✓ mtxt_to_midi convenience function works")
+    # Convert back to MTXT
+    file2 = mtxt.MtxtFile.from_midi(midi_path, verbose=False)
+    assert file2.version is not None, "Converted file should have version"
 
-            finally:
-                if os.path.exists(midi_path2):
-                    os.unlink(midi_path2)
-        finally:
-            if os.path.exists(mtxt_path):
-                os.unlink(mtxt_path)
+    # Test the convenience functions
+    mtxt_path = str(tmp_path / "file.mtxt")
+    file.save(mtxt_path)
 
-    finally:
-        if os.path.exists(midi_path):
-            os.unlink(midi_path)
+    # Test mtxt_to_midi convenience function
+    midi_path2 = str(tmp_path / "file2.mid")
+    mtxt.mtxt_to_midi(mtxt_path, midi_path2, verbose=False)
+    assert os.path.exists(midi_path2), "MIDI file should exist"
 
 
-def test_version():
+def test_version(mtxt_module):
     """Test version attribute"""
-    print("\nTest 7: Version...")
-    import mtxt
+    mtxt = mtxt_module
 
     assert hasattr(mtxt, '__version__'), "Should have __version__ attribute"
     version = mtxt.__version__
     assert isinstance(version, str), "Version should be a string"
     assert len(version) > 0, "Version should not be empty"
-    print(f"  ✓ mtxt version: {version}")
-
-
-def main():
-    """Run all tests"""
-    print("=" * 60)
-    print("MTXT Python Bindings Test Suite")
-    print("=" * 60)
-
-    try:
-        import mtxt
-        print(f"✓ Successfully imported mtxt module")
-        print(f"✓ Version: {mtxt.__version__}")
-        print()
-    except ImportError as e:
-        print(f"✗ Failed to import mtxt: {e}")
-        print()
-        print("Make sure you've built the module with:")
-        print("  maturin develop")
-        return 1
-
-    tests = [
-        test_basic_parsing,
-        test_file_io,
-        test_string_representation,
-        test_metadata_manipulation,
-        test_error_handling,
-        test_midi_conversion,
-        test_version,
-    ]
-
-    failed = []
-    for test in tests:
-        try:
-            test()
-        except Exception as e:
-            print(f"  ✗ Test failed: {e}")
-            import traceback
-            traceback.print_exc()
-            failed.append(test.__name__)
-
-    print()
-    print("=" * 60)
-    if failed:
-        print(f"✗ {len(failed)} test(s) failed: {', '.join(failed)}")
-        return 1
-    else:
-        print(f"✓ All {len(tests)} tests passed!")
-        return 0
-
-
-if __name__ == "__main__":
-    sys.exit(main())
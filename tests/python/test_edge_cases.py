@@ -1,112 +1,76 @@
-#!/usr/bin/env python3
 """
 Edge case tests for MTXT Python bindings.
 
 Tests unusual scenarios, boundary conditions, and potential failure modes.
+
+Run with: pytest tests/python/
 """
 
-import sys
-import os
-import tempfile
-from pathlib import Path
+from math import isclose
 
+import pytest
 
-def test_load_same_file_multiple_times():
-    """Test loading the same file multiple times doesn't cause issues"""
-    import mtxt
 
-    content = """mtxt 1.0
-meta global title "Test"
+MINIMAL_MTXT = """mtxt 1.0
 0 tempo 120
 0 note C4 dur=1
 """
 
-    # Create temp file
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.mtxt', delete=False) as f:
-        f.write(content)
-        temp_path = f.name
-
-    try:
-        # Load same file multiple times
-        file1 = mtxt.load(temp_path)
-        file2 = mtxt.load(temp_path)
-        file3 = mtxt.load(temp_path)
-
-        # All should be independent
-        file1.set_metadata("test1", "value1")
-        file2.set_metadata("test2", "value2")
-        file3.set_metadata("test3", "value3")
-
-        # Check independence
-        assert file1.get_meta("test1") == "value1"
-        assert file1.get_meta("test2") is None
-        assert file1.get_meta("test3") is None
-
-        assert file2.get_meta("test1") is None
-        assert file2.get_meta("test2") == "value2"
-        assert file2.get_meta("test3") is None
-
-        assert file3.get_meta("test1") is None
-        assert file3.get_meta("test2") is None
-        assert file3.get_meta("test3") == "value3"
-
-        print("✓ Multiple loads are independent")
+TITLED_MTXT = """mtxt 1.0
+meta global title "Original"
+0 tempo 120
+0 note C4 dur=1
+"""
 
-    finally:
-        os.unlink(temp_path)
 
+@pytest.fixture
+def loaded_files(mtxt_module, tmp_path):
+    """Provides three fresh objects loaded from the same file"""
+    temp_path = tmp_path / "file.mtxt"
+    temp_path.write_text(TITLED_MTXT)
 
-def test_bidirectional_conversion_chain():
-    """Test conversion chains: MTXT → MIDI → MTXT → MIDI"""
-    import mtxt
+    return tuple(mtxt_module.load(str(temp_path)) for _ in range(3))
 
-    content = """mtxt 1.0
-meta global title "Chain Test"
-0 tempo 120
-0 timesig 4/4
-0 note C4 dur=1 vel=0.8
-1 note E4 dur=1 vel=0.8
-2 note G4 dur=1 vel=0.8
-"""
 
-    with tempfile.TemporaryDirectory() as tmpdir:
-        paths = {
-            'mtxt1': os.path.join(tmpdir, 'file1.mtxt'),
-            'midi1': os.path.join(tmpdir, 'file1.mid'),
-            'mtxt2': os.path.join(tmpdir, 'file2.mtxt'),
-            'midi2': os.path.join(tmpdir, 'file2.mid'),
-        }
+@pytest.mark.parametrize("idx", range(3))
+def test_load_same_file_multiple_times(loaded_files, idx):
+    """Test loading the same file multiple times doesn't cause issues"""
+    key = f"test{idx}"
+    loaded_files[idx].set_metadata(key, f"value{idx}")
 
-        # MTXT → MIDI → MTXT → MIDI
-        file1 = mtxt.parse(content)
-        file1.save(paths['mtxt1'])
-        print(f"  1. Saved MTXT: {os.path.getsize(paths['mtxt1'])} bytes")
+    # Only the modified object should see the change
+    for other, file in enumerate(loaded_files):
+        expected = f"value{idx}" if other == idx else None
+        assert file.get_meta(key) == expected, f"file{other} has {key}={file.get_meta(key)!r}"
 
-        file1.to_midi(paths['midi1'])
-        print(f"  2. Converted to MIDI: {os.path.getsize(paths['midi1'])} bytes")
 
-        file2 = mtxt.MtxtFile.from_midi(paths['midi1'])
-        file2.save(paths['mtxt2'])
-        print(f"  3. Converted back to MTXT: {os.path.getsize(paths['mtxt2'])} bytes")
+@pytest.mark.midi
+@pytest.mark.heavy
+def test_bidirectional_conversion_chain(mtxt_module, parsed_sample):
+    """Test conversion chains: MTXT → MIDI → MTXT → MIDI → MTXT"""
+    mtxt = mtxt_module
 
-        file2.to_midi(paths['midi2'])
-        print(f"  4. Converted to MIDI again: {os.path.getsize(paths['midi2'])} bytes")
+    # MTXT → MIDI → MTXT → MIDI → MTXT, all in memory
+    midi1 = parsed_sample.to_midi_bytes()
+    file2 = mtxt.MtxtFile.from_midi_bytes(midi1)
+    midi2 = file2.to_midi_bytes()
+    file3 = mtxt.MtxtFile.from_midi_bytes(midi2)
 
-        # Check all files exist
-        for name, path in paths.items():
-            assert os.path.exists(path), f"{name} doesn't exist"
-            assert os.path.getsize(path) > 0, f"{name} is empty"
+    # Both generations should be valid MIDI
+    for name, data in (("midi1", midi1), ("midi2", midi2)):
+        assert data[:4] == b'MThd', f"{name} has invalid MIDI header: {data[:4]}"
 
-        # Check basic properties preserved
-        assert file2.version is not None
-        assert file2.duration is not None
+    # Check basic properties preserved
+    assert file2.version is not None
+    assert file2.duration is not None
 
-        print("✓ Bidirectional conversion chain works")
+    # A second pass through MIDI should not move events in time
+    assert file3.duration == file2.duration, f"Duration drifted: {file2.duration} -> {file3.duration}"
 
 
-def test_parse_vs_load_consistency():
+def test_parse_vs_load_consistency(mtxt_module, tmp_path):
     """Test that parse(string) and load(file) produce identical results"""
-    import mtxt
+    mtxt = mtxt_module
 
     content = """mtxt 1.0
 meta global title "Consistency Test"
@@ -121,114 +85,82 @@ meta global artist "Test Artist"
     file_from_parse = mtxt.parse(content)
 
     # Save and load from file
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.mtxt', delete=False) as f:
-        f.write(content)
-        temp_path = f.name
-
-    try:
-        file_from_load = mtxt.load(temp_path)
+    temp_path = tmp_path / "file.mtxt"
+    temp_path.write_text(content)
 
-        # Compare properties
-        assert file_from_parse.version == file_from_load.version
-        assert file_from_parse.duration == file_from_load.duration
-        assert len(file_from_parse) == len(file_from_load)
-        assert dict(file_from_parse.metadata) == dict(file_from_load.metadata)
+    file_from_load = mtxt.load(str(temp_path))
 
-        # Serialize both
-        serialized_parse = str(file_from_parse)
-        serialized_load = str(file_from_load)
+    # Compare properties
+    assert file_from_parse.version == file_from_load.version
+    assert file_from_parse.duration == file_from_load.duration
+    assert len(file_from_parse) == len(file_from_load)
+    assert file_from_parse.metadata == file_from_load.metadata
 
-        # Should be identical
-        assert serialized_parse == serialized_load
+    # Serialize both
+    serialized_parse = str(file_from_parse)
+    serialized_load = str(file_from_load)
 
-        print("✓ parse() and load() are consistent")
+    # Should be identical
+    assert serialized_parse == serialized_load
 
-    finally:
-        os.unlink(temp_path)
 
+def check_serialization_stable(mtxt, iterations):
+    """Serialize and re-parse `iterations` times, checking output is a fixpoint"""
+    file = mtxt.parse(MINIMAL_MTXT)
+    serialized = str(file)
 
-def test_repeated_serialization():
-    """Test serializing and re-parsing multiple times remains stable"""
-    import mtxt
-
-    content = """mtxt 1.0
-0 tempo 120
-0 note C4 dur=1
-"""
-
-    file = mtxt.parse(content)
-
-    # Serialize and re-parse 5 times
-    for i in range(5):
-        serialized = str(file)
+    for i in range(iterations):
         file = mtxt.parse(serialized)
 
         # Properties should remain stable
         assert file.version == "1.0"
         assert len(file) >= 3  # At least version, tempo, note
 
-    print("✓ Repeated serialization is stable")
+        # Output should not drift once serialized
+        assert str(file) == serialized, f"Serialization drifted on iteration {i + 1}"
 
 
-def test_midi_roundtrip_preserves_structure():
-    """Test MIDI roundtrip preserves basic musical structure"""
-    import mtxt
+def test_serialization_fixpoint(mtxt_module):
+    """Test serializing and re-parsing reaches a stable fixpoint"""
+    check_serialization_stable(mtxt_module, iterations=2)
 
-    content = """mtxt 1.0
-meta global title "Structure Test"
-0 tempo 120
-0 timesig 4/4
-0 note C4 dur=1 vel=0.8
-1 note D4 dur=1 vel=0.8
-2 note E4 dur=1 vel=0.8
-3 note F4 dur=1 vel=0.8
-4 note G4 dur=1 vel=0.8
-"""
 
-    with tempfile.TemporaryFile(suffix='.mid') as midi_file:
-        # Convert to MIDI
-        file1 = mtxt.parse(content)
-        original_duration = file1.duration
+@pytest.mark.slow
+def test_serialization_stability_deep(mtxt_module):
+    """Test serializing and re-parsing many times remains stable"""
+    check_serialization_stable(mtxt_module, iterations=50)
 
-        # Use a named temporary file for MIDI
-        with tempfile.NamedTemporaryFile(suffix='.mid', delete=False) as f:
-            midi_path = f.name
 
-        try:
-            file1.to_midi(midi_path)
-
-            # Convert back
-            file2 = mtxt.MtxtFile.from_midi(midi_path)
+@pytest.mark.midi
+@pytest.mark.heavy
+def test_midi_roundtrip_preserves_structure(mtxt_module, parsed_sample, sample_midi_path):
+    """Test MIDI roundtrip preserves basic musical structure"""
+    mtxt = mtxt_module
 
-            # Duration should be approximately preserved
-            assert file2.duration is not None
-            duration_diff = abs(file2.duration - original_duration)
-            assert duration_diff < 1.0, f"Duration changed too much: {duration_diff}"
+    original_duration = parsed_sample.duration
 
-            # Should still have a tempo and notes
-            assert file2.version is not None
-            assert len(file2) > 0
+    # Convert back
+    file2 = mtxt.MtxtFile.from_midi(str(sample_midi_path))
 
-            print("✓ MIDI roundtrip preserves structure")
+    # Duration should be approximately preserved
+    assert file2.duration is not None
+    assert isclose(file2.duration, original_duration, abs_tol=1.0), \
+        f"Duration changed too much: {original_duration} -> {file2.duration}"
 
-        finally:
-            os.unlink(midi_path)
+    # Should still have a tempo and notes
+    assert file2.version is not None
+    assert len(file2) > 0
 
 
-def test_empty_metadata_operations():
+def test_empty_metadata_operations(mtxt_module):
     """Test files with no metadata handle operations correctly"""
-    import mtxt
+    mtxt = mtxt_module
 
     # File with no metadata
-    content = """mtxt 1.0
-0 tempo 120
-0 note C4
-"""
-
-    file = mtxt.parse(content)
+    file = mtxt.parse(MINIMAL_MTXT)
 
     # Metadata should be empty
-    assert len(file.metadata) == 0
+    assert file.metadata_len() == 0
 
     # Getting non-existent metadata
     assert file.get_meta("nonexistent") is None
@@ -237,90 +169,67 @@ def test_empty_metadata_operations():
     # Setting metadata on empty file
     file.set_metadata("new_key", "new_value")
     assert file.get_meta("new_key") == "new_value"
-    assert len(file.metadata) == 1
+    assert file.metadata_len() == 1
+    assert len(file.metadata) == file.metadata_len()
 
-    print("✓ Empty metadata operations work")
 
+@pytest.fixture(scope="module")
+def overwrite_path(tmp_path_factory):
+    """Provides a path that already holds an MTXT file, shared by the module"""
+    path = tmp_path_factory.mktemp("overwrite") / "file.mtxt"
+    path.write_text('mtxt 1.0\nmeta global iteration "initial"\n')
+    return str(path)
 
-def test_overwrite_same_file():
-    """Test overwriting the same file multiple times"""
-    import mtxt
 
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.mtxt', delete=False) as f:
-        temp_path = f.name
+@pytest.mark.parametrize("i", range(5))
+def test_overwrite_same_file(mtxt_module, overwrite_path, i):
+    """Test overwriting the same file multiple times"""
+    mtxt = mtxt_module
 
-    try:
-        # Write and overwrite multiple times
-        for i in range(5):
-            content = f"""mtxt 1.0
+    content = f"""mtxt 1.0
 meta global iteration "{i}"
 0 tempo {100 + i * 10}
 0 note C4
 """
-            file = mtxt.parse(content)
-            file.save(temp_path)
+    file = mtxt.parse(content)
+    file.save(overwrite_path)
 
-            # Load back and verify
-            loaded = mtxt.load(temp_path)
-            assert loaded.get_meta("iteration") == f'"{i}"'
+    # Load back and verify
+    loaded = mtxt.load(overwrite_path)
+    assert loaded.get_meta("iteration") == f'"{i}"'
 
-        print("✓ Overwriting same file works")
 
-    finally:
-        os.unlink(temp_path)
+@pytest.fixture
+def concurrent_files(mtxt_module):
+    """Provides three fresh objects parsed from the same content"""
+    return tuple(mtxt_module.parse(TITLED_MTXT) for _ in range(3))
 
 
-def test_concurrent_file_objects():
+@pytest.mark.parametrize("idx", [0, 1, 2])
+def test_concurrent_file_objects(concurrent_files, idx):
     """Test multiple file objects from same source don't interfere"""
-    import mtxt
-
-    content = """mtxt 1.0
-meta global title "Original"
-0 tempo 120
-0 note C4
-"""
-
-    # Create multiple objects from same content
-    file1 = mtxt.parse(content)
-    file2 = mtxt.parse(content)
-    file3 = mtxt.parse(content)
-
-    # Modify each differently
-    file1.set_metadata("id", "file1")
-    file2.set_metadata("id", "file2")
-    file3.set_metadata("id", "file3")
+    file_id = f"file{idx}"
+    concurrent_files[idx].set_metadata("id", file_id)
 
     # Verify no cross-contamination
-    assert file1.get_meta("id") == "file1"
-    assert file2.get_meta("id") == "file2"
-    assert file3.get_meta("id") == "file3"
+    for other, file in enumerate(concurrent_files):
+        if other == idx:
+            assert file.get_meta("id") == file_id
+        else:
+            assert file.get_meta("id") != file_id
 
-    # Original title should still be in all
-    assert file1.get_meta("title") == '"Original"'
-    assert file2.get_meta("title") == '"Original"'
-    assert file3.get_meta("title") == '"Original"'
+        # Original title should still be in all
+        assert file.get_meta("title") == '"Original"'
 
-    print("✓ Concurrent file objects are independent")
 
-
-def test_large_file_handling():
+def test_large_file_handling(mtxt_module, test_file_paths):
     """Test handling of files with many records"""
-    import mtxt
-
-    # Generate a file with many notes
-    lines = ["mtxt 1.0", "0 tempo 120"]
-
-    # Add 1000 notes
-    for i in range(1000):
-        beat = i * 0.25  # 250 beats total
-        pitch = 60 + (i % 12)  # Cycle through octave
-        lines.append(f"{beat} note C4 vel=0.8")
+    mtxt = mtxt_module
 
-    content = "\n".join(lines)
-
-    file = mtxt.parse(content)
+    # Pre-generated file with 1000 notes, 4 per beat, 250 beats total
+    file = mtxt.load(str(test_file_paths["large"]))
 
-    assert len(file) >= 1000  # At least 1000 records plus header/tempo
+    assert len(file) >= 1000, f"Expected at least 1000 records, got {len(file)}"
     assert file.duration is not None
     assert file.duration >= 249.0  # Should be around 250 beats
 
@@ -328,59 +237,39 @@ def test_large_file_handling():
     serialized = str(file)
     assert len(serialized) > 10000  # Should be substantial
 
-    print(f"✓ Large file handling works ({len(file)} records)")
 
-
-def test_midi_file_not_found():
+@pytest.mark.midi
+def test_midi_file_not_found(mtxt_module):
     """Test proper error handling for non-existent MIDI files"""
-    import mtxt
+    mtxt = mtxt_module
 
-    try:
+    with pytest.raises(IOError, match="nonexistent"):
         mtxt.MtxtFile.from_midi("/nonexistent/path/file.mid")
-        assert False, "Should have raised error"
-    except Exception as e:
-        assert "nonexistent" in str(e).lower() or "no such file" in str(e).lower()
-        print(f"✓ MIDI file not found handled: {type(e).__name__}")
 
 
-def test_mtxt_file_not_found():
+def test_mtxt_file_not_found(mtxt_module):
     """Test proper error handling for non-existent MTXT files"""
-    import mtxt
+    mtxt = mtxt_module
 
-    try:
+    with pytest.raises(IOError, match="nonexistent"):
         mtxt.load("/nonexistent/path/file.mtxt")
-        assert False, "Should have raised IOError"
-    except IOError as e:
-        assert "nonexistent" in str(e).lower()
-        print(f"✓ MTXT file not found handled: {type(e).__name__}")
 
 
-def test_invalid_midi_conversion():
+@pytest.mark.midi
+def test_invalid_midi_conversion(mtxt_module):
     """Test error handling for invalid MIDI conversion attempts"""
-    import mtxt
+    mtxt = mtxt_module
 
     file = mtxt.parse("mtxt 1.0\n0 tempo 120")
 
-    # Try to write to invalid path
-    try:
+    # Try to write to invalid path - should be ConversionError or IOError/OSError
+    with pytest.raises((mtxt.ConversionError, OSError)):
         file.to_midi("/root/impossible/path/file.mid")
-        assert False, "Should have raised error"
-    except Exception as e:
-        # Should be ConversionError, IOError, or OSError
-        assert "ConversionError" in type(e).__name__ or "IOError" in type(e).__name__ or "OSError" in type(e).__name__
-        print(f"✓ Invalid MIDI path handled: {type(e).__name__}")
 
 
-def test_string_representation_stability():
+def test_string_representation_stability(fresh_parsed):
     """Test __str__ and __repr__ are stable across operations"""
-    import mtxt
-
-    content = """mtxt 1.0
-0 tempo 120
-0 note C4
-"""
-
-    file = mtxt.parse(content)
+    file = fresh_parsed
 
     # Get initial representations
     str1 = str(file)
@@ -404,12 +293,10 @@ def test_string_representation_stability():
     assert "version" in repr1.lower()
     assert "version" in repr2.lower()
 
-    print("✓ String representations are stable")
 
-
-def test_zero_duration_file():
+def test_zero_duration_file(mtxt_module):
     """Test files with no timed events (duration = None or 0)"""
-    import mtxt
+    mtxt = mtxt_module
 
     # File with only header
     minimal = mtxt.parse("mtxt 1.0")
@@ -422,107 +309,32 @@ meta global artist "Nobody"
 """)
     assert metadata_only.duration is None or metadata_only.duration == 0
 
-    print("✓ Zero duration files handled")
-
 
-def test_mixed_load_methods():
+@pytest.mark.midi
+@pytest.mark.heavy
+def test_mixed_load_methods(mtxt_module, tmp_path, sample_mtxt_content, sample_midi_path):
     """Test mixing parse(), load(), and from_midi() in same session"""
-    import mtxt
+    mtxt = mtxt_module
 
-    content = """mtxt 1.0
-0 tempo 120
-0 note C4 dur=1
-"""
+    mtxt_path = tmp_path / "test.mtxt"
+
+    # Write files
+    mtxt_path.write_text(sample_mtxt_content)
+
+    # Load via parse
+    file1 = mtxt.parse(sample_mtxt_content)
+
+    # Load via load
+    file2 = mtxt.load(str(mtxt_path))
+
+    # Load via from_midi
+    file3 = mtxt.MtxtFile.from_midi(str(sample_midi_path))
+
+    # All should work independently
+    file1.set_metadata("source", "parse")
+    file2.set_metadata("source", "load")
+    file3.set_metadata("source", "from_midi")
 
-    with tempfile.TemporaryDirectory() as tmpdir:
-        mtxt_path = os.path.join(tmpdir, "test.mtxt")
-        midi_path = os.path.join(tmpdir, "test.mid")
-
-        # Write files
-        with open(mtxt_path, 'w') as f:
-            f.write(content)
-
-        # Load via parse
-        file1 = mtxt.parse(content)
-        file1.to_midi(midi_path)
-
-        # Load via load
-        file2 = mtxt.load(mtxt_path)
-
-        # Load via from_midi
-        file3 = mtxt.MtxtFile.from_midi(midi_path)
-
-        # All should work independently
-        file1.set_metadata("source", "parse")
-        file2.set_metadata("source", "load")
-        file3.set_metadata("source", "from_midi")
-
-        assert file1.get_meta("source") == "parse"
-        assert file2.get_meta("source") == "load"
-        assert file3.get_meta("source") == "from_midi"
-
-        print("✓ Mixed load methods work independently")
-
-
-def main():
-    """Run all edge case tests"""
-    print("=" * 70)
-    print("MTXT Edge Case Test Suite")
-    print("=" * 70)
-
-    try:
-        import mtxt
-        print(f"✓ Successfully imported mtxt v{mtxt.__version__}\n")
-    except ImportError as e:
-        print(f"✗ Failed to import mtxt: {e}")
-        print("\nMake sure you've built the module with:")
-        print("  maturin develop --features python,midi")
-        return 1
-
-    tests = [
-        test_load_same_file_multiple_times,
-        test_bidirectional_conversion_chain,
-        test_parse_vs_load_consistency,
-        test_repeated_serialization,
-        test_midi_roundtrip_preserves_structure,
-        test_empty_metadata_operations,
-        test_overwrite_same_file,
-        test_concurrent_file_objects,
-        test_large_file_handling,
-        test_midi_file_not_found,
-        test_mtxt_file_not_found,
-        test_invalid_midi_conversion,
-        test_string_representation_stability,
-        test_zero_duration_file,
-        test_mixed_load_methods,
-    ]
-
-    failed = []
-    for i, test in enumerate(tests, 1):
-        print(f"\n{i}. {test.__name__}")
-        print(f"   {test.__doc__}")
-        try:
-            test()
-        except Exception as e:
-            print(f"   ✗ FAILED: {e}")
-            import traceback
-            traceback.print_exc()
-            failed.append(test.__name__)
-
-    # Summary
-    print("\n" + "=" * 70)
-    print("Test Summary")
-    print("=" * 70)
-
-    if failed:
-        print(f"✗ {len(failed)} test(s) failed out of {len(tests)}:")
-        for test in failed:
-            print(f"  - {test}")
-        return 1
-    else:
-        print(f"✓ All {len(tests)} edge case tests passed!")
-        return 0
-
-
-if __name__ == "__main__":
-    sys.exit(main())
+    assert file1.get_meta("source") == "parse"
+    assert file2.get_meta("source") == "load"
+    assert file3.get_meta("source") == "from_midi"
@@ -5,22 +5,76 @@ Tests for MIDI bytes operations (to_midi_bytes / from_midi_bytes).
 Tests the new bytes-based API for working with MIDI data in memory.
 """
 
+import hashlib
+import importlib.util
 import sys
-import tempfile
-import os
+from math import isclose
 
+import pytest
 
-def test_to_midi_bytes_basic():
-    """Test converting MTXT to MIDI bytes"""
+try:
     import mtxt
+except ImportError as e:
+    if __name__ != "__main__":
+        pytest.fail(
+            f"Failed to import mtxt module: {e}\n\n"
+            "Make sure you've built the module with:\n"
+            "  maturin develop --features python,midi",
+            pytrace=False,
+        )
+    mtxt = None
 
-    content = """mtxt 1.0
+pytestmark = pytest.mark.midi
+
+
+MINIMAL_MTXT = """mtxt 1.0
+0 tempo 120
+0 note C4 dur=1
+"""
+
+EMPTY_MTXT = "mtxt 1.0\n0 tempo 120\n"
+
+TIMESIG_MTXT = """mtxt 1.0
+meta global title "Test"
+0 tempo 120
+0 timesig 4/4
+0 note C4 dur=1 vel=0.8
+1 note D4 dur=1 vel=0.8
+2 note E4 dur=1 vel=0.8
+"""
+
+METADATA_MTXT = """mtxt 1.0
+meta global title "Song Title"
+meta global artist "Artist Name"
+meta global composer "Composer"
 0 tempo 120
 0 note C4 dur=1
 """
 
-    file = mtxt.parse(content)
-    midi_bytes = file.to_midi_bytes()
+
+def midi_digest(data):
+    """Short digest for comparing large MIDI payloads"""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+@pytest.fixture(scope="module")
+def simple_file():
+    """Provides MINIMAL_MTXT parsed once per module - do not mutate"""
+    return mtxt.parse(MINIMAL_MTXT)
+
+
+@pytest.fixture(scope="module")
+def simple_midi(has_midi, simple_file):
+    """Provides MINIMAL_MTXT converted to MIDI bytes once per module"""
+    if not has_midi:
+        pytest.skip("MIDI support not available")
+
+    return simple_file.to_midi_bytes()
+
+
+def test_to_midi_bytes_basic(simple_midi):
+    """Test converting MTXT to MIDI bytes"""
+    midi_bytes = simple_midi
 
     # Should return bytes
     assert isinstance(midi_bytes, bytes), f"Expected bytes, got {type(midi_bytes)}"
@@ -35,22 +89,10 @@ def test_to_midi_bytes_basic():
     print(f"✓ to_midi_bytes() returns valid MIDI ({len(midi_bytes)} bytes)")
 
 
-def test_from_midi_bytes_basic():
+def test_from_midi_bytes_basic(simple_midi):
     """Test parsing MIDI from bytes"""
-    import mtxt
-
-    content = """mtxt 1.0
-0 tempo 120
-0 note C4 dur=1
-1 note E4 dur=1
-"""
-
-    # Convert to bytes
-    file1 = mtxt.parse(content)
-    midi_bytes = file1.to_midi_bytes()
-
     # Parse from bytes
-    file2 = mtxt.MtxtFile.from_midi_bytes(midi_bytes)
+    file2 = mtxt.MtxtFile.from_midi_bytes(simple_midi)
 
     # Should have version and duration
     assert file2.version is not None, "Missing version"
@@ -62,48 +104,31 @@ def test_from_midi_bytes_basic():
     print(f"✓ from_midi_bytes() parsed {len(file2)} records")
 
 
-def test_bytes_vs_file_equivalence():
-    """Test that bytes methods produce same result as file methods"""
-    import mtxt
-
-    content = """mtxt 1.0
-meta global title "Test"
-0 tempo 120
-0 timesig 4/4
-0 note C4 dur=1 vel=0.8
-1 note D4 dur=1 vel=0.8
-2 note E4 dur=1 vel=0.8
-"""
-
-    file = mtxt.parse(content)
-
-    # Get bytes via new method
+def test_bytes_deterministic(tmp_path):
+    """Test that converting the same content to bytes always gives the same MIDI"""
+    file = mtxt.parse(TIMESIG_MTXT)
     bytes_direct = file.to_midi_bytes()
 
-    # Get bytes via file method
-    with tempfile.NamedTemporaryFile(suffix='.mid', delete=False) as tmp:
-        tmp_path = tmp.name
+    # to_midi() should write exactly these bytes
+    midi_path = tmp_path / "test.mid"
+    file.to_midi(str(midi_path))
+    assert midi_path.read_bytes() == bytes_direct, "to_midi() and to_midi_bytes() differ"
 
-    try:
-        file.to_midi(tmp_path)
-        with open(tmp_path, 'rb') as f:
-            bytes_from_file = f.read()
+    # Same object, and a separately parsed copy of the same content
+    bytes_again = file.to_midi_bytes()
+    bytes_reparsed = mtxt.parse(TIMESIG_MTXT).to_midi_bytes()
 
-        # Should be identical
-        assert bytes_direct == bytes_from_file, \
-            f"Bytes differ: {len(bytes_direct)} vs {len(bytes_from_file)}"
+    # Should be identical
+    assert bytes_direct == bytes_again, \
+        f"Bytes differ: {len(bytes_direct)} vs {len(bytes_again)}"
+    assert bytes_direct == bytes_reparsed, \
+        f"Bytes differ: {len(bytes_direct)} vs {len(bytes_reparsed)}"
 
-        print(f"✓ Bytes methods equivalent to file methods ({len(bytes_direct)} bytes)")
-
-    finally:
-        if os.path.exists(tmp_path):
-            os.unlink(tmp_path)
+    print(f"✓ Bytes output is deterministic ({len(bytes_direct)} bytes)")
 
 
 def test_roundtrip_bytes():
     """Test MTXT → bytes → MTXT roundtrip"""
-    import mtxt
-
     content = """mtxt 1.0
 meta global title "Roundtrip Test"
 meta global artist "Tester"
@@ -126,8 +151,8 @@ meta global artist "Tester"
 
     # Duration should be approximately preserved
     assert file2.duration is not None
-    duration_diff = abs(file2.duration - original_duration)
-    assert duration_diff < 1.0, f"Duration changed too much: {duration_diff}"
+    assert isclose(file2.duration, original_duration, abs_tol=1.0), \
+        f"Duration changed too much: {original_duration} -> {file2.duration}"
 
     # Should have version
     assert file2.version is not None
@@ -140,38 +165,24 @@ meta global artist "Tester"
 
 def test_bytes_with_metadata():
     """Test that metadata is preserved through bytes conversion"""
-    import mtxt
-
-    content = """mtxt 1.0
-meta global title "Song Title"
-meta global artist "Artist Name"
-meta global composer "Composer"
-0 tempo 120
-0 note C4 dur=1
-"""
-
-    file1 = mtxt.parse(content)
+    file1 = mtxt.parse(METADATA_MTXT)
     midi_bytes = file1.to_midi_bytes()
     file2 = mtxt.MtxtFile.from_midi_bytes(midi_bytes)
 
     # MIDI preserves some metadata (at least title)
-    metadata = dict(file2.metadata)
-    assert len(metadata) > 0, "No metadata preserved"
+    meta_count = file2.metadata_len()
+    assert meta_count > 0, "No metadata preserved"
 
     # At least title should be there
     title = file2.get_meta("title")
     assert title is not None, "Title not preserved in MIDI"
 
-    print(f"✓ Metadata preserved through bytes ({len(metadata)} entries)")
+    print(f"✓ Metadata preserved through bytes ({meta_count} entries)")
 
 
 def test_bytes_empty_file():
     """Test bytes methods with minimal file"""
-    import mtxt
-
-    content = "mtxt 1.0\n0 tempo 120\n"
-
-    file1 = mtxt.parse(content)
+    file1 = mtxt.parse(EMPTY_MTXT)
     midi_bytes = file1.to_midi_bytes()
 
     # Should still produce valid MIDI
@@ -187,15 +198,12 @@ def test_bytes_empty_file():
 
 def test_bytes_large_file():
     """Test bytes methods with file containing many notes"""
-    import mtxt
-
-    # Generate file with 100 notes
-    lines = ["mtxt 1.0", "0 tempo 120"]
-    for i in range(100):
-        beat = i * 0.25
-        lines.append(f"{beat} note C4 dur=0.25 vel=0.8")
-
-    content = "\n".join(lines)
+    # Generate file with 100 notes, 4 per beat
+    content = "\n".join([
+        "mtxt 1.0",
+        "0 tempo 120",
+        *(f"{i * 0.25} note C4 dur=0.25 vel=0.8" for i in range(100)),
+    ])
 
     file1 = mtxt.parse(content)
     midi_bytes = file1.to_midi_bytes()
@@ -204,6 +212,12 @@ def test_bytes_large_file():
     assert len(midi_bytes) > 100, "MIDI too small for 100 notes"
     assert len(midi_bytes) < 50000, "MIDI unexpectedly large"
 
+    # Should be deterministic - compare digests so a mismatch logs compactly
+    midi_again = file1.to_midi_bytes()
+    assert len(midi_again) == len(midi_bytes), \
+        f"Bytes differ in size: {len(midi_bytes)} vs {len(midi_again)}"
+    assert midi_digest(midi_again) == midi_digest(midi_bytes), "Bytes differ"
+
     # Should be parseable
     file2 = mtxt.MtxtFile.from_midi_bytes(midi_bytes)
     assert len(file2) > 50, f"Too few records: {len(file2)}"
@@ -211,19 +225,10 @@ def test_bytes_large_file():
     print(f"✓ Large file (100 notes) → {len(midi_bytes)} bytes → {len(file2)} records")
 
 
-def test_bytes_basic_api():
+def test_bytes_basic_api(simple_file):
     """Test that bytes API works without verbose parameter (simplified in v0.9)"""
-    import mtxt
-
-    content = """mtxt 1.0
-0 tempo 120
-0 note C4 dur=1
-"""
-
-    file = mtxt.parse(content)
-
     # Test to_midi_bytes works
-    midi_bytes = file.to_midi_bytes()
+    midi_bytes = simple_file.to_midi_bytes()
     assert len(midi_bytes) > 0, "should produce bytes"
 
     # Test from_midi_bytes works
@@ -235,8 +240,6 @@ def test_bytes_basic_api():
 
 def test_bytes_api_exists():
     """Test that new API methods exist and are accessible"""
-    import mtxt
-
     # Should be instance methods
     assert hasattr(mtxt.MtxtFile, 'to_midi_bytes'), "Missing to_midi_bytes"
     assert hasattr(mtxt.MtxtFile, 'from_midi_bytes'), "Missing from_midi_bytes (class)"
@@ -254,31 +257,18 @@ def test_bytes_api_exists():
 
 def test_bytes_error_handling():
     """Test error handling for invalid MIDI bytes"""
-    import mtxt
-
     # Invalid MIDI data
     invalid_bytes = b"Not a MIDI file"
 
-    try:
+    with pytest.raises(mtxt.ConversionError, match="MIDI") as excinfo:
         mtxt.MtxtFile.from_midi_bytes(invalid_bytes)
-        assert False, "Should have raised ConversionError"
-    except mtxt.ConversionError as e:
-        assert "MIDI" in str(e) or "parse" in str(e).lower(), f"Unexpected error: {e}"
-        print(f"✓ Invalid MIDI bytes raise ConversionError: {type(e).__name__}")
+    print(f"✓ Invalid MIDI bytes raise ConversionError: {excinfo.type.__name__}")
 
 
-def test_bytes_use_case_http():
+def test_bytes_use_case_http(simple_file):
     """Test simulated HTTP use case"""
-    import mtxt
-
-    content = """mtxt 1.0
-0 tempo 120
-0 note C4 dur=1
-"""
-
     # Simulate server: serialize for transmission
-    file = mtxt.parse(content)
-    midi_data = file.to_midi_bytes()
+    midi_data = simple_file.to_midi_bytes()
 
     # Simulate client: receive and parse
     received_file = mtxt.MtxtFile.from_midi_bytes(midi_data)
@@ -291,20 +281,12 @@ def test_bytes_use_case_http():
 
 def test_bytes_use_case_database():
     """Test simulated database storage use case"""
-    import mtxt
-
-    content = """mtxt 1.0
-meta global title "DB Test"
-0 tempo 120
-0 note C4 dur=1
-"""
-
-    file = mtxt.parse(content)
+    file = mtxt.parse(METADATA_MTXT)
 
     # Simulate storing in database
     db_record = {
         'song_id': 123,
-        'title': 'DB Test',
+        'title': 'Song Title',
         'midi_data': file.to_midi_bytes()
     }
 
@@ -317,17 +299,9 @@ meta global title "DB Test"
     print(f"✓ Database-like use case: {len(db_record['midi_data'])} bytes stored")
 
 
-def test_module_level_consistency():
+def test_module_level_consistency(simple_midi):
     """Test module-level from_midi_bytes matches pattern of parse/load"""
-    import mtxt
-
-    content = """mtxt 1.0
-0 tempo 120
-0 note C4 dur=1
-"""
-
-    file = mtxt.parse(content)
-    midi_bytes = file.to_midi_bytes()
+    midi_bytes = simple_midi
 
     # Both should work and produce equivalent results
     file_via_class = mtxt.MtxtFile.from_midi_bytes(midi_bytes)
@@ -347,66 +321,19 @@ def test_module_level_consistency():
 
 
 def main():
-    """Run all bytes tests"""
-    print("=" * 70)
-    print("MTXT MIDI Bytes API Test Suite")
-    print("=" * 70)
-
-    try:
-        import mtxt
-        print(f"✓ Successfully imported mtxt v{mtxt.__version__}\n")
-    except ImportError as e:
-        print(f"✗ Failed to import mtxt: {e}")
+    """Run the bytes tests through pytest"""
+    if mtxt is None:
+        print("✗ Failed to import mtxt")
         print("\nMake sure you've built the module with:")
         print("  maturin develop --features python,midi")
         return 1
 
-    # Check for MIDI support
-    if not hasattr(mtxt, 'midi_to_mtxt'):
-        print("✗ MIDI support not available (midi feature not enabled)")
-        return 1
+    print(f"✓ Successfully imported mtxt v{mtxt.__version__}")
 
-    tests = [
-        test_to_midi_bytes_basic,
-        test_from_midi_bytes_basic,
-        test_bytes_vs_file_equivalence,
-        test_roundtrip_bytes,
-        test_bytes_with_metadata,
-        test_bytes_empty_file,
-        test_bytes_large_file,
-        test_bytes_verbose,
-        test_bytes_api_exists,
-        test_bytes_error_handling,
-        test_bytes_use_case_http,
-        test_bytes_use_case_database,
-        test_module_level_consistency,
-    ]
-
-    failed = []
-    for i, test in enumerate(tests, 1):
-        print(f"\n{i}. {test.__name__}")
-        print(f"   {test.__doc__}")
-        try:
-            test()
-        except Exception as e:
-            print(f"   ✗ FAILED: {e}")
-            import traceback
-            traceback.print_exc()
-            failed.append(test.__name__)
-
-    # Summary
-    print("\n" + "=" * 70)
-    print("Test Summary")
-    print("=" * 70)
-
-    if failed:
-        print(f"✗ {len(failed)} test(s) failed out of {len(tests)}:")
-        for test in failed:
-            print(f"  - {test}")
-        return 1
-    else:
-        print(f"✓ All {len(tests)} MIDI bytes tests passed!")
-        return 0
+    args = [__file__, "-q"]
+    if importlib.util.find_spec("xdist") is not None:
+        args += ["-n", "auto"]
+    return pytest.main(args)
 
 
 if __name__ == "__main__":